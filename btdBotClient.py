@@ -23,24 +23,61 @@
 import os
 import sys
 import logging
+import logging.handlers
+import queue
+import atexit
 import time
 import json
 import math
+import random
+import re
+import signal
+import asyncio
+import functools
+import types
+from dataclasses import dataclass, field, asdict
+from typing import Optional
+from decimal import Decimal, ROUND_DOWN
+try:
+    # Optional, much faster json parsing and serialization
+    import orjson
+except ImportError:
+    orjson = None
+try:
+    # Optional, faster drop in replacement for the asyncio event loop (not on Windows)
+    import uvloop
+except ImportError:
+    uvloop = None
 from telethon import TelegramClient
 from telethon.events import NewMessage
 from telethon.errors import SessionPasswordNeededError
+from watchfiles import awatch
+import websockets
 
 from dydx3 import Client as dydx3_client
 from dydx3 import constants as dydx3_constants
 from dydx3.helpers import request_helpers as dydx3_request_helpers
+from dydx3.helpers import requests as dydx3_requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
 ### Global variables ###
 
 config = {}
-state = {}
+state = None
 logger = None
 dydx_api = None
+dydx_ws_host = None
 telegram_api = None
+stop_event = None
+startup_task = None
+config_mtime = None
+
+# Parsed trading rules for each pair we trade, see cache_pair_info()
+pair_cache = {}
+
+# Last response from the exchange's get_accounts(), see get_accounts()
+accounts_cache = {'time' : 0.0, 'data' : None}
 
 ### Global bot settings ###
 
@@ -68,6 +105,18 @@ settings = {
     # Our desired IDs
     'chat_id' : -1001552279905,
     'bot_id' : 5861320113,
+
+    # Account info from the exchange is reused for this many seconds. Fills and transfers
+    # reported on the account websocket clear it straight away
+    'accounts_cache_ttl' : 2.0,
+
+    # Seconds to wait for a response from the exchange's REST API before giving up
+    'dydx_api_timeout' : 10.0,
+
+    # Seconds to wait before reconnecting to telegram after losing our connection. This
+    # doubles (plus some random jitter) for each failed attempt, up to the max delay
+    'telegram_reconnect_delay' : 1.0,
+    'telegram_reconnect_max_delay' : 60.0,
 }
 
 ### File names ###
@@ -79,6 +128,11 @@ settings['log_file'] = settings['bot_short_name'] + '.log'      # Name of our lo
 # having to restart the bot
 settings['config_file'] = settings['bot_short_name'] + '_config.json'
 
+# Changes to the config file are picked up from file system notifications, but these are
+# not delivered on some network shares and docker volumes so we also check the file
+# every this many seconds
+settings['config_poll_interval'] = 30.0
+
 # File where bot state is saved on exit
 settings['state_file'] = settings['bot_short_name'] + '_state.json'
 
@@ -90,6 +144,32 @@ settings['telegram_chat_id_file'] = settings['bot_short_name'] + '_chatId.json'
 # bot is thinking. Don't include the extention as we may dump in a few different formats.
 settings['dump_file'] = settings['bot_short_name'] + '_dump'
 
+### Derived settings ###
+
+# Our trade pair name, in the exchange's format
+settings['trade_pair'] = settings['base_asset'] + '-' + settings['quote_asset']
+
+# Settings are fixed once the bot is running, make accidental writes fail loudly
+settings = types.MappingProxyType(settings)
+
+# The chat and bot our trade signals come from, we ignore messages from anywhere else
+signal_chat_id = settings['chat_id']
+signal_bot_id = settings['bot_id']
+
+### Environment ###
+
+# Environment variables holding our exchange and telegram credentials, the bot won't
+# start without all of them
+required_env_vars = (
+    'DYDX_API_KEY',
+    'DYDX_API_SECRET',
+    'DYDX_API_PASS',
+    'DYDX_STARK_KEY',
+    'DYDX_ETH_ADDR',
+    'TELEGRAM_APP_ID',
+    'TELEGRAM_APP_HASH',
+)
+
 ### Bot defaults ###
 
 # Default config values
@@ -102,20 +182,20 @@ default_config = {
     'trade_size_factor' : 0.95,
 }
 
-# Default state variables
-default_state = {
-    'bot_run' : True,
-    'bot_init' : True,
-    'current_total_balance' : -1.0,
-    'current_quote_balance' : -1.0,
-    'starting_balance' : -1.0,
-    'trade_pair' : '',
-    'pair_info' : {},
-    'open_pos_info' : [],
-    'open_trades' : 0,
-    'exit_order_id' : None,
-    'dydx_pos_id' : 0,
-}
+# Default state variables, every bot_state() starts out with its own copy of these
+@dataclass(slots=True)
+class bot_state:
+    bot_run: bool = True
+    bot_init: bool = True
+    current_total_balance: float = -1.0
+    current_quote_balance: float = -1.0
+    starting_balance: float = -1.0
+    trade_pair: str = ''
+    pair_info: dict = field(default_factory=dict)
+    open_pos_info: list = field(default_factory=list)
+    open_trades: int = 0
+    exit_order_id: Optional[str] = None
+    dydx_pos_id: int = 0
 
 ### Helper classes ###
 
@@ -129,33 +209,117 @@ class logger_writer:
        self.linebuf = ''
 
     def write(self, buf):
-       for line in buf.rstrip().splitlines():
-           self.logger.log(self.level, log_add_utc_time(line.rstrip()))
+       # Hold on to partial lines until their newline arrives, then log all the lines
+       # completed by this write as a single record
+       self.linebuf += buf
+       if not '\n' in buf:
+           return
+       complete, self.linebuf = self.linebuf.rsplit('\n', 1)
+       self.emit(complete)
        
     def flush(self):
-        pass
+        # Log any partial line we are holding on to
+        if self.linebuf:
+            self.emit(self.linebuf)
+            self.linebuf = ''
+
+    def emit(self, text):
+        lines = [line.rstrip() for line in text.rstrip().splitlines()]
+        if lines:
+            self.logger.log(self.level, '\n'.join(lines))
 
 class one_line_exception_formatter(logging.Formatter):
     # Class to handle formating multi-line exceptions into single lines for logs
+    # Time stamps are in UTC, the time used by most exchanges by default, so this
+    # will make our troubleshooting easier
+    converter = time.gmtime
+
+    # Last time stamp we built, see formatTime()
+    cached_second = None
+    cached_time = ''
+
     def format_exception(self, exc_info):
         result = super().format_exception(exc_info)
         return repr(result)
  
+    def formatTime(self, record, datefmt=None):
+        # Records tend to arrive in bursts, so reuse the time stamp while we are still in
+        # the same second rather than running strftime for every record. Milliseconds are
+        # added separately by our format string
+        second = int(record.created)
+        if second != self.cached_second:
+            self.cached_time = super().formatTime(record, datefmt)
+            self.cached_second = second
+        return self.cached_time
+
     def format(self, record):
         result = super().format(record)
         if record.exc_text:
             result = result.replace("\n", "")
         return result
 
+@dataclass(frozen=True)
+class pair_details:
+    # Trading rules for a pair, parsed once from the exchange market info so that
+    # rounding doesn't need to re-parse strings. The scales (sizes per unit, see
+    # size_scale()) let us multiply rather than divide when rounding. The exact tick and
+    # step are kept as decimals parsed from the exchange's strings for rounding values
+    # we send in orders
+    tick: float
+    tick_scale: float
+    step: float
+    step_scale: float
+    min_qty: float
+    max_qty: float
+    tick_exact: Decimal
+    step_exact: Decimal
+
 ### Helper functions ###
 
+def configure_dydx_session():
+    # dydx3 sends all of its requests through one shared requests session. Size its
+    # connection pool for our concurrent executor calls so connections (and their TLS
+    # handshakes) are reused, and retry transient failures. Retry leaves POST requests
+    # alone by default, so orders are never sent twice
+    retries = Retry(
+        total=3,
+        backoff_factor=0.2,
+        status_forcelist=(429, 500, 502, 503, 504),
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=8, max_retries=retries)
+    dydx3_requests.session.mount('https://', adapter)
+
+def get_accounts():
+    # Get our account info from the exchange, reusing a recent response to save a signed
+    # round trip. This blocks, so use the executor when calling from the event loop
+    now = time.monotonic()
+    if accounts_cache['data'] is not None and now - accounts_cache['time'] < settings['accounts_cache_ttl']:
+        return accounts_cache['data']
+
+    accounts_cache['data'] = dydx_api.private.get_accounts().data
+    accounts_cache['time'] = now
+    return accounts_cache['data']
+
+def invalidate_accounts_cache():
+    # Force the next get_accounts() call to go to the exchange
+    accounts_cache['data'] = None
+
 def update_current_balance():
     global state
 
-    response = dydx_api.private.get_accounts()
-    account = response.data['accounts'][0]
-    state['current_total_balance'] = float(account['equity'])
-    log_debug(f"Current balance = {state['current_total_balance']} {settings['quote_asset']}")
+    account = get_accounts()['accounts'][0]
+    state.current_total_balance = float(account['equity'])
+    log_debug('Current balance = %s %s', state.current_total_balance, settings['quote_asset'])
+
+def apply_account_update(account):
+    # Update our balances from account info pushed to us over the websocket, updates
+    # only include the fields that changed
+    if 'equity' in account:
+        state.current_total_balance = float(account['equity'])
+        log_debug('Current balance = %s %s', state.current_total_balance, settings['quote_asset'])
+    if 'quoteBalance' in account:
+        state.current_quote_balance = float(account['quoteBalance'])
 
 def get_position_size():
     # TODO - Query exchange for current position size
@@ -164,51 +328,113 @@ def get_position_size():
 def get_order_size():
     # Determine our max allowable position size
     total_position_size = get_position_size()
-    position_size = round_to_step(total_position_size / float(config['maxOpenOrders']), state['trade_pair'])
+    position_size = round_to_step(total_position_size / float(config['maxOpenOrders']), state.trade_pair)
     #log_debug(f"Desired position size = {position_size}"")
 
     # Determine minimum position size. This works out to be 10 USDT worth of the pair
     # We add a little to this value just to be safe as the price can change quickly
-    min_pos_size = get_min_qty(state['trade_pair'])
+    min_pos_size = get_min_qty(state.trade_pair)
     #log_debug(f"Minimum position size = {min_pos_size}")
     if position_size < min_pos_size:
         return -1.0
 
     # Clamp the order size to the max for this market, if applicable
-    max_pos_size = get_max_qty(state['trade_pair'])
+    max_pos_size = get_max_qty(state.trade_pair)
     if position_size > max_pos_size: # TODO - Break this up into multiple entry / exit orders once this becomes an issue?
-        log_debug(f"Desired position size of {position_size} exceeded market max lot size of {max_pos_size} for pair {state['trade_pair']}. Clamping to max lot size")
+        log_debug('Desired position size of %s exceeded market max lot size of %s for pair %s. Clamping to max lot size', position_size, max_pos_size, state.trade_pair)
         position_size = max_pos_size
 
     return float(position_size)
    
 def get_max_qty(pair):
     # Get maxQty for pair
-    return float(state['pair_info']['maxposition_size'])
+    return pair_cache[pair].max_qty
 
 def get_min_qty(pair):
     # Get minQty for pair
-    return float(state['pair_info']['minOrderSize'])
+    return pair_cache[pair].min_qty
 
 def get_tick(pair):
     # Get pair tick size
-    return float(state['pair_info']['tick_size'])
+    return pair_cache[pair].tick
 
 def get_step(pair):
     # Get pair step size
-    return float(state['pair_info']['step_size'])
+    return pair_cache[pair].step
+
+def size_scale(size):
+    # Number of ticks or steps per unit, used to round by multiplying rather than dividing
+    # Where a whole number of sizes make up one unit (0.1, 0.5) make the scale an exact
+    # integer, this keeps float error out of the scale itself, e.g. 10 rather than 1 / 0.1.
+    # Other sizes (0.3, 5) are used as is
+    scale = round(1.0 / size)
+    if scale > 0 and math.isclose(scale * size, 1.0, rel_tol=1e-9):
+        return scale
+    return 1.0 / size
+
+def cache_pair_info(pair, pair_info):
+    # Parse the market info returned by the exchange for pair into our pair cache
+    tick = float(pair_info['tickSize'])
+    step = float(pair_info['stepSize'])
+    pair_cache[pair] = pair_details(
+        tick = tick,
+        tick_scale = size_scale(tick),
+        step = step,
+        step_scale = size_scale(step),
+        min_qty = float(pair_info['minOrderSize']),
+        max_qty = float(pair_info['maxPositionSize']),
+        tick_exact = Decimal(pair_info['tickSize']),
+        step_exact = Decimal(pair_info['stepSize']),
+    )
 
 def round_to_tick(value, pair):
-    # Round passed value to the pair tick size
-    tick_size = get_tick(pair)
-    tnum_ticks = math.floor(value / tick_size)
-    return tnum_ticks * tick_size
+    # Round passed value down to the pair tick size
+    # The small nudge stops float error from dropping a value that is already on a
+    # tick down to the one below, which the exchange would then reject. Prices and
+    # sizes are never negative, so truncating with int() is the same as flooring
+    details = pair_cache[pair]
+    return int(value * details.tick_scale + 1e-9) / details.tick_scale
 
 def round_to_step(value, pair):
-    # Round passed value to the pair step size
-    step_size = get_step(pair)
-    num_steps = math.floor(value / step_size)
-    return num_steps * step_size
+    # Round passed value down to the pair step size, see round_to_tick()
+    details = pair_cache[pair]
+    return int(value * details.step_scale + 1e-9) / details.step_scale
+
+def round_to_tick_exact(value, pair):
+    # Round passed value down to the pair tick size as an exact decimal. Slower than
+    # round_to_tick() but can't land off the tick grid, so use it for prices we send
+    # to the exchange
+    tick = pair_cache[pair].tick_exact
+    return (Decimal(str(value)) / tick).to_integral_value(rounding=ROUND_DOWN) * tick
+
+def round_to_step_exact(value, pair):
+    # Round passed value down to the pair step size as an exact decimal, see round_to_tick_exact()
+    step = pair_cache[pair].step_exact
+    return (Decimal(str(value)) / step).to_integral_value(rounding=ROUND_DOWN) * step
+
+def decimal_to_str(value):
+    # Convert a decimal from the exact rounding helpers above to the string the library
+    # expects, the decimal already has the right precision so just trim any trailing zeros
+    txt_out = format(value, 'f')
+    if '.' in txt_out:
+        txt_out = txt_out.rstrip('0').rstrip('.')
+    return txt_out
+
+@functools.lru_cache(maxsize=16)
+def size_format_str(size):
+    # Build the format string for values rounded to the passed tick or step size
+    # Only a couple of sizes are ever used, so the result is cached
+
+    # Determine precision / number of decimal places from size value. Sizes are powers
+    # of ten, so this is just the negated exponent
+    if size > 0:
+        precision = max(0, -int(round(math.log10(size))))
+    else:
+        log_error("Unknown size value of '%s' requested in float_to_str(), using 0 as a failsafe", size)
+        precision = 0
+    
+    # Generate our format string from the desired precision value
+    return '{:.' + str(precision) + 'f}'
 
 def float_to_str(value, pair, precision_type):
     # Convert float to string, the library expects strings for floats
@@ -226,113 +452,169 @@ def float_to_str(value, pair, precision_type):
         size = get_tick(pair)
     else:
         # Define a default precision
-        log_error(f"Unknown precision value of '{precision_type}' requested in float_to_str(), using 0 as a failsafe")
+        log_error("Unknown precision value of '%s' requested in float_to_str(), using 0 as a failsafe", precision_type)
         size = 1.0
 
-    # Determine precision / number of decimal places from size value
-    # This is the brute force method, Might want to do this in a more elegant way
-    if size == 1.0:
-        precision = 0
-    elif size == 0.1:
-        precision = 1
-    elif size == 0.01:
-        precision = 2
-    elif size == 0.001:
-        precision = 3
-    elif size == 0.0001:
-        precision = 4
-    elif size == 0.00001:
-        precision = 5
-    elif size == 0.000001:
-        precision = 6
-    elif size == 0.0000001:
-        precision = 7
-    elif size == 0.00000001:
-        precision = 8
-    else:
-        log_error(f"Unknown size value of '{size}' requested in float_to_str(), using 1 as a failsafe")
-        size = 1.0
-        precision = 0
-    
-    # Generate our format string from the desired precision value
-    txt_out = '{val:.' + str(precision) + 'f}'
-    
     # Convert the passed value to a string
-    txt_out = txt_out.format(val = value)
+    txt_out = size_format_str(size).format(value)
     
-    # Trim any trailing zeros from the resulting string
-    while txt_out.__contains__('.') and txt_out[-1] == '0':
-        txt_out = txt_out[:-1]
-    
-    # If all zeros were trimmed, then remove the trailing dot
-    if txt_out[-1] == '.':
-        txt_out = txt_out[:-1]
+    # Trim any trailing zeros from the resulting string, and the dot if all zeros were trimmed
+    if '.' in txt_out:
+        txt_out = txt_out.rstrip('0').rstrip('.')
     
     return txt_out
 
-def log_add_utc_time(msg):
-    # Add the utc time to our log message. UTC is the time used by most exchanges
-    # by default, so this will make our troubleshooting easier
+def log_info(msg, *args):
+    # Send the the message to the logger, our formatter adds the time stamp. Any args are
+    # %-formatted into msg only if the record is actually emitted
+    logger.info(msg, *args)
+    
+def log_debug(msg, *args):
+    # Send the the message to the logger, see log_info()
+    logger.debug(msg, *args)
     
-    # Use the library helper function to get the current ISO time string
-    timestamp = dydx3_request_helpers.generate_now_iso()
+def log_error(msg, *args):
+    # Send the the message to the logger, see log_info()
+    logger.error(msg, *args)
+
+def get_required_env():
+    # Read all of our required environment variables in one pass and return them as a
+    # dict. Exits if any are missing or empty, listing them all so the user can fix
+    # everything at once
+    env = {name : os.environ.get(name) for name in required_env_vars}
+    missing = [name for name, value in env.items() if not value]
+    if missing:
+        log_error('Environment variables not found: %s, exiting', ', '.join(missing))
+        sys.exit(1)
+    return env
+
+def load_json_file(path):
+    # Read and parse a json file, using orjson if it is installed
+    with open(path, 'rb') as infile:
+        data = infile.read()
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+def save_json_file(path, data):
+    # Write data to a json file, using orjson if it is installed. We write to a temp file
+    # and swap it in so a crash part way through can't leave a half written file behind
+    if orjson is not None:
+        out = orjson.dumps(data, option=orjson.OPT_INDENT_2)
+    else:
+        out = json.dumps(data, indent=2).encode()
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as outfile:
+        outfile.write(out)
+    os.replace(tmp_path, path)
+
+def reload_config():
+    # Merge any changes made to the config file into our running config
+    # Returns False if the file could not be parsed or doesn't hold a json object,
+    # the user's editor may still be part way through writing it
+    global config_mtime
 
-    # Build output message
-    return timestamp + ' - ' + str(msg)
+    try:
+        mtime = os.stat(settings['config_file']).st_mtime_ns
+        if mtime == config_mtime:
+            return True
+        new_config = load_json_file(settings['config_file'])
+    except FileNotFoundError:
+        log_error('Config file is missing, keeping current config')
+        return True
+    except OSError as e:
+        # e.g. we aren't allowed to read it, trying again straight away won't help
+        log_error('Unable to read the config file, keeping current config')
+        log_error(e)
+        return True
+    except ValueError:
+        # json.JSONDecodeError (orjson's subclasses it) or a UnicodeDecodeError from the
+        # stdlib parser, either way the file may still be part written
+        return False
 
-def log_info(msg):
-    # Send the the message to the logger with the exchange time stamp added
-    logger.info(log_add_utc_time(str(msg)))
-    
-def log_debug(msg):
-    # Send the the message to the logger with the exchange time stamp added
-    logger.debug(log_add_utc_time(str(msg)))
-    
-def log_error(msg):
-    # Send the the message to the logger with the exchange time stamp added
-    logger.error(log_add_utc_time(str(msg)))
+    # Valid json can still be something other than an object, e.g. a list
+    if not isinstance(new_config, dict):
+        return False
+
+    config.update(new_config)
+    config_mtime = mtime
+    log_debug('Bot config reloaded from file')
+    return True
 
 ### Core functions ###
 
-def initialize():
+async def initialize():
 
     global config
+    global config_mtime
     global state
     global logger
     global dydx_api
+    global dydx_ws_host
     global telegram_api
 
+    # Bind the settings we use more than once to locals
+    log_file = settings['log_file']
+    config_file = settings['config_file']
+    state_file = settings['state_file']
+    dydx_network = settings['dydx_network']
+    bot_name = settings['bot_long_name'] + ' ' + settings['bot_version']
+
     try:
-                # Initialize our state dict to sane starting values
-        state = default_state
-        state['bot_run'] = True
-        state['bot_init'] = True
+        # Initialize our state to sane starting values
+        state = bot_state()
 
         # Wipe our log file before we start to prevent this file from growing infinitely long
-        if os.path.isfile(settings['log_file']):
-            try:
-                os.remove(settings['log_file'])
-            except OSError:
-                print('Unable to clear out the log file')
-                quit()
+        try:
+            os.remove(log_file)
+        except FileNotFoundError:
+            pass
+        except OSError:
+            print('Unable to clear out the log file')
+            sys.exit(1)
 
         # Setup logging
         log_level = logging.DEBUG    # Log level for our console and log file
         logger = logging.getLogger(settings['bot_short_name'])
         logger.setLevel(log_level)
+        # Our records are handled here only, don't also pass them up to any handlers our
+        # modules may have put on the root logger
+        logger.propagate = False
+        # Our modules are very chatty at debug level, only pass on their warnings
+        for module_name in ('telethon', 'urllib3', 'websockets'):
+            logging.getLogger(module_name).setLevel(logging.WARNING)
         # Create file handler 
-        fh = logging.FileHandler(settings['log_file'])
+        fh = logging.FileHandler(log_file)
         fh.setLevel(log_level)
+        # Buffer file writes so bursts of output go to disk together, errors are written
+        # straight away and anything left is flushed when logging shuts down on exit
+        mh = logging.handlers.MemoryHandler(capacity=64, flushLevel=logging.ERROR, target=fh)
+        mh.setLevel(log_level)
         # Create console handler 
         ch = logging.StreamHandler()
         ch.setLevel(log_level)
         # Create formatter and add it to the handlers
-        formatter = one_line_exception_formatter(logging.BASIC_FORMAT)
+        # The time stamp is only built for records that are emitted, in the same ISO format
+        # the exchange uses
+        formatter = one_line_exception_formatter(
+            '%(levelname)s:%(name)s:%(asctime)s.%(msecs)03dZ - %(message)s',
+            datefmt='%Y-%m-%dT%H:%M:%S',
+        )
         fh.setFormatter(formatter)
         ch.setFormatter(formatter)
-        # Add the handlers to the logger
-        logger.addHandler(fh)
-        logger.addHandler(ch)
+        # Hand records to a background thread that does the actual console and file
+        # writes, so logging never blocks the caller on I/O. The queue handler flattens
+        # each record to its message before queueing it, so give it our formatter to keep
+        # exceptions on one line
+        log_queue = queue.SimpleQueue()
+        qh = logging.handlers.QueueHandler(log_queue)
+        qh.setFormatter(one_line_exception_formatter('%(message)s'))
+        listener = logging.handlers.QueueListener(log_queue, mh, ch, respect_handler_level=True)
+        listener.start()
+        # Drain the queue on exit, this runs before logging flushes and closes our handlers
+        atexit.register(listener.stop)
+        # Add the queue handler to the logger
+        logger.addHandler(qh)
 
         # Redirect stdout and stderr to the logger, this will caputre anything
         # from our modules or the OS in our console and our log file
@@ -340,20 +622,22 @@ def initialize():
         sys.stderr = logger_writer(logger, logging.ERROR)
 
         # Let the user know we are running
-        log_debug(settings['bot_long_name'] + ' ' + settings['bot_version'] + ' initializing')
+        log_debug('%s initializing', bot_name)
 
-        # Initialize configuration variables
-        if os.path.isfile(settings['config_file']):
+        # Initialize configuration variables, just try loading the config file rather than
+        # checking for it first
+        try:
             # Load our config from file
-            config = json.load(open(settings['config_file']))
+            config = load_json_file(config_file)
+            config_mtime = os.stat(config_file).st_mtime_ns
             log_debug('Bot config loaded from file')
-        else:
+        except FileNotFoundError:
             # Use default sane values, if we need other variables, add them here
-            config = default_config
+            config = dict(default_config)
 
             # Save the default config to allow the user to make on the fly changes
-            with open(settings['config_file'], 'w') as outfile:
-                outfile.write(json.dumps(config, indent=2))
+            save_json_file(config_file, config)
+            config_mtime = os.stat(config_file).st_mtime_ns
             log_debug('Using default values for bot config')
 
         # Capture initial enable_trading value and force it to False
@@ -361,253 +645,159 @@ def initialize():
         config['enable_trading'] = False
 
         # Define some connection variables depending on our desired network connection
-        if settings['dydx_network'] == 'mainnet':
+        if dydx_network == 'mainnet':
             api_host = str(dydx3_constants.API_HOST_MAINNET)
             api_network = str(dydx3_constants.NETWORK_ID_MAINNET)
-        elif settings['dydx_network'] == 'testnet':
+            dydx_ws_host = str(dydx3_constants.WS_HOST_MAINNET)
+        elif dydx_network == 'testnet':
             api_host = str(dydx3_constants.API_HOST_GOERLI)
             api_network = str(dydx3_constants.NETWORK_ID_GOERLI)
+            dydx_ws_host = str(dydx3_constants.WS_HOST_GOERLI)
         else:
-            log_error(f"Setting dydx_network set to unknown value = {settings['dydx_network']} exiting")
-            quit()
+            log_error('Setting dydx_network set to unknown value = %s exiting', dydx_network)
+            sys.exit(1)
+
+        # Read our exchange and telegram credentials from our environment
+        env = get_required_env()
 
         # Create a client instance using api key and secret from environment variables
-        api_key = str(os.environ.get('DYDX_API_KEY'))
-        log_debug(f"Exchange API key = {api_key}")
-        if api_key == 'None':
-            log_error('DYDX_API_KEY environment variable not found, exiting')
-            quit()
-        api_secret = str(os.environ.get('DYDX_API_SECRET'))
-        if api_secret == 'None':
-            log_error('DYDX_API_SECRET environment variable not found, exiting')
-            quit()
-        api_pass = str(os.environ.get('DYDX_API_PASS'))
-        if api_pass == 'None':
-            log_error('DYDX_API_PASS environment variable not found, exiting')
-            quit()
+        log_debug('Exchange API key = %s', env['DYDX_API_KEY'])
         api_credentials = {
-            'key' : api_key, 
-            'secret' : api_secret, 
-            'passphrase' : api_pass,
+            'key' : env['DYDX_API_KEY'], 
+            'secret' : env['DYDX_API_SECRET'], 
+            'passphrase' : env['DYDX_API_PASS'],
         }
         
         # We need our stark private key for placing orders
-        api_stark_key = str(os.environ.get('DYDX_STARK_KEY'))
-        if api_stark_key == 'None':
-            log_error('DYDX_STARK_KEY environment variable not found, exiting')
-            quit()
+        api_stark_key = env['DYDX_STARK_KEY']
         
         # ETH address only needed for some top level actions
         # Note that we can also get this from our profile using API credentials
-        api_eth_addr = str(os.environ.get('DYDX_ETH_ADDR'))
-        if api_eth_addr == 'None':
-            log_error('DYDX_ETH_ADDR environment variable not found, exiting')
-            quit()
+        api_eth_addr = env['DYDX_ETH_ADDR']
         
+        # The dydx3 client is synchronous, so run its blocking calls in the default
+        # executor to keep the event loop free for telegram
+        loop = asyncio.get_running_loop()
+
         # Create our exchange client
-        dydx_api = dydx3_client(
+        dydx_api = await loop.run_in_executor(None, functools.partial(
+            dydx3_client,
             host=api_host, 
+            api_timeout=settings['dydx_api_timeout'],
             network_id = api_network, 
             api_key_credentials=api_credentials, 
             stark_private_key=api_stark_key,
             default_ethereum_address=api_eth_addr
-        )
+        ))
+        configure_dydx_session()
         log_debug('DyDx API client created')
 
-        # Capture our position ID so we can place orders
-        response = dydx_api.private.get_accounts()
-        state['dydx_pos_id'] = response.data['accounts'][0]['positionId']
-        log_debug(f"DyDx position ID = {state['dydx_pos_id']}")
+        # Our trade pair name
+        pair = settings['trade_pair']
+        state.trade_pair = pair
+        log_debug('Trade pair = %s', pair)
 
-        # Build our trade pair name
-        pair = settings['base_asset'] + '-' +  settings['quote_asset']
-        state['trade_pair'] = pair
-        log_debug(f"Trade pair = {pair}")
+        # Get our account and the details of our trade pair from the exchange. These don't
+        # depend on each other, so run them at the same time
+        accounts, response = await asyncio.gather(
+            loop.run_in_executor(None, get_accounts),
+            loop.run_in_executor(None, dydx_api.public.get_markets, pair),
+        )
 
-        # Get the details of this trade pair from the exchange
-        response = dydx_api.public.get_markets(pair)
-        state['pair_info'] = response.data['markets'][pair]
-        log_debug(f"Pair info obtained for pair {pair}")
+        # Capture our position ID so we can place orders, and our balance from the same
+        # response. The account websocket keeps the balance up to date from here on
+        account = accounts['accounts'][0]
+        state.dydx_pos_id = account['positionId']
+        state.current_total_balance = float(account['equity'])
+        log_debug('DyDx position ID = %s', state.dydx_pos_id)
+        log_debug('Current balance = %s %s', state.current_total_balance, settings['quote_asset'])
+
+        # Capture the details of this trade pair
+        state.pair_info = response.data['markets'][pair]
+        cache_pair_info(pair, state.pair_info)
+        log_debug('Pair info obtained for pair %s', pair)
         
         # If we exited the bot in a position, load our state for the saved file,
         # otherwise we'll start in our default state
         init_state = {}
-        init_state['exit_order_id'] = None
-        if os.path.isfile(settings['state_file']):
-            init_state = json.load(open(settings['state_file']))
+        state_file_found = True
+        try:
+            init_state = load_json_file(state_file)
+        except FileNotFoundError:
+            state_file_found = False
+        if init_state.get('exit_order_id') is not None:
+            # Build the saved state before touching the file, if it doesn't match bot_state
+            # we exit with the file still there rather than losing track of our position
+            state = bot_state(**init_state)
+            # The state was saved while we were shutting down, we're running again now
+            state.bot_run = True
+            log_debug('Found open position for pair %s, loading state from file', state.trade_pair)
+        else:
+            # We've already set our state to defaults earlier on, so just need to initialize a few more values here
+            state.trade_pair = pair
+            state.starting_balance = state.current_total_balance
+            log_debug('No open position found for pair %s, using default state', pair)
+
+        # We have what we need from the state file now, so clear it out
+        if state_file_found:
             try:
-                os.remove(settings['state_file'])
+                os.remove(state_file)
             except OSError:
                 log_error('Unable to clear out the state file')
-        if not init_state['exit_order_id'] == None:
-            state = json.load(open(settings['state_file']))
-            log_debug(f"Found open position for pair {state['trade_pair']}, loading state from file")
-        else:
-            # We've already set our state to defaults earlier on, so just need to initialize a few more values here
-            state['trade_pair'] = pair
-            update_current_balance()
-            state['starting_balance'] = state['current_total_balance']
-            log_debug(f"No open position found for pair {pair}, using default state")
-
-        # Read telegram API variables from our environment
-        app_id = str(os.environ.get('TELEGRAM_APP_ID'))
-        if app_id == 'None':
-            log_error('TELEGRAM_APP_ID environment variable not found, exiting')
-            quit()
-        
-        app_hash = str(os.environ.get('TELEGRAM_APP_HASH'))
-        if app_hash == 'None':
-            log_error('TELEGRAM_APP_HASH environment variable not found, exiting')
-            quit()
-            
+
         # Setup the telegram bot
-        telegram_api = TelegramClient(settings['bot_short_name'], app_id, app_hash)
+        telegram_api = TelegramClient(settings['bot_short_name'], env['TELEGRAM_APP_ID'], env['TELEGRAM_APP_HASH'])
 
         # Restore our enable_trading value
         config['enable_trading'] = original_enable_trading
 
         # Let the usr know we completed initialization
-        log_info(f"{settings['bot_long_name']} {settings['bot_version']} started, waiting for user messages")
+        log_info('%s started, waiting for user messages', bot_name)
 
     except Exception as e:
         log_error('Exception occured in initialize')
         log_error(e)
-        state['bot_run'] == False
+        # Exit with an error rather than running on half initialized, so a service manager
+        # can restart us cleanly
+        state.bot_run = False
+        sys.exit(1)
+
+# Trade messages look like this, we only accept them for our own trade pair
+#   2022-11-22T14:00:00Z, BUY BTC-USD 5 of 8, SELL @ 18698
+trade_message_re = re.compile(
+    r'^\s*([^,]+?)\s*,'
+    r'\s*BUY\s+(' + re.escape(settings['trade_pair']) + r')\s+(\d+)\s+OF\s+(\d+)\s*,'
+    r'\s*SELL\s+@\s*(\d+(?:\.\d+)?)\s*$',
+    re.IGNORECASE
+)
 
 def parse_trade_message(msg_text):
 
     # Parses the chat message and returns the requested order details
     # Will return None if it can't parse the passed message
 
-    # Do some formating on the passed message
-    msg = str(msg_text).strip().upper()
-
-    # Make sure our message has our seperation character
-    if not ',' in msg:
-        log_debug(f"Failed to parse trade message : {msg}")
-        log_debug('Message does not include comma seperators, ignoring')
-        return None
-    
-    # Split our message into its parts
-    msg_parts = str(msg).split(sep=',')
-
-    # Make sure we got the right number of parts
-    if not len(msg_parts) == 3:
-        log_debug(f"Failed to parse trade message : {msg}")
-        log_debug('Message does not have the right number of parts, ignoring')
+    # Match the whole message in one go, see trade_message_re above for the format
+    match = trade_message_re.match(str(msg_text))
+    if match is None:
+        log_debug('Failed to parse trade message : %s', msg_text)
         return None
 
-    # Extract our message parts
-    msg_timestamp = str(msg_parts[0]).strip()
-    msg_buy_order = str(msg_parts[1]).strip()
-    msg_sell_order = str(msg_parts[2]).strip()
-
-    # Make sure our buy order starts with BUY
-    if not msg_buy_order.startswith('BUY'):
-        log_debug(f"Failed to parse trade message : {msg}")
-        log_debug('Second part does not start with BUY, ignoring')
-        return None
-
-    # Make sure our buy order contains our part seperator
-    if not msg_buy_order.contains(' '):
-        log_debug(f"Failed to parse trade message : {msg}")
-        log_debug('Second part does not include multiple parts, ignoring')
-        return None
-
-    buy_parts = msg_buy_order.split(' ')
-    
-    # Make sure our buy order has the right number of parts
-    if not len(buy_parts) == 5:
-        log_debug(f"Failed to parse trade message : {msg}")
-        log_debug('Second part does not have the right number of parts, ignoring')
-        return None
-
-    # Extract our buy parts
-    msg_buy_command = str(buy_parts[0]).strip()
-    msg_buy_pair = str(buy_parts[1]).strip()
-    msg_buy_count = str(buy_parts[2]).strip()
-    msg_buy_of = str(buy_parts[3]).strip()
-    msg_buy_total = str(buy_parts[4]).strip()
-    
-    # Make sure we start with the command
-    if not msg_buy_command == 'BUY':
-        log_debug(f"Failed to parse trade message : {msg}")
-        log_debug('Second part does not start with BUY, ignoring')
-        return None
-
-    # Make sure we are dealing with a supported pair
-    if not msg_buy_pair == 'BTC_USD':
-        log_debug(f"Failed to parse trade message : {msg}")
-        log_debug('Second part does not include seported pair, ignoring')
-        return None
-
-    # Make sure the part between our numbers is the right one
-    if not msg_buy_of == 'OF':
-        log_debug(f"Failed to parse trade message : {msg}")
-        log_debug('Second part number seperator incorrect, ignoring')
-        return None
-
-    # Make sure we got order numbers
-    if not msg_buy_count.isnumeric() and not msg_buy_total.isnumeric():
-        log_debug(f"Failed to parse trade message : {msg}")
-        log_debug('Second part count or total are not numbers, ignoring')
-        return None
+    # The pattern only matches digits, so these conversions can't fail
+    buy_count = int(match.group(3))
+    buy_total = int(match.group(4))
 
     # Make sure our count is less than or equal to our total
-    if msg_buy_count > msg_buy_total:
-        log_debug(f"Failed to parse trade message : {msg}")
-        log_debug('Second part count is greater than total, ignoring')
-        return None
-
-    # Make sure our sell order starts with SELL
-    if not msg_sell_order.startswith('SELL'):
-        log_debug(f"Failed to parse trade message : {msg}")
-        log_debug('Third part does not start with SELL, ignoring')
-        return None
-    
-    # Make sure our sell order contains our part seperator
-    if not msg_sell_order.contains(' '):
-        log_debug(f"Failed to parse trade message : {msg}")
-        log_debug('Third part does not include multiple parts, ignoring')
-        return None
-
-    sell_parts = msg_buy_order.split(' ')
-    
-    # Make sure our sell order has the right number of parts
-    if not len(sell_parts) == 3:
-        log_debug(f"Failed to parse trade message : {msg}")
-        log_debug('Third part does not have the right number of parts, ignoring')
-        return None
-
-    # Extract our buy parts
-    msg_sell_command = str(sell_parts[0]).strip()
-    msg_sell_at = str(sell_parts[1]).strip()
-    msg_sell_price = str(sell_parts[2]).strip()
-    
-    # Make sure we start with the command
-    if not msg_sell_command == 'SELL':
-        log_debug(f"Failed to parse trade message : {msg}")
-        log_debug('Third part does not start with SELL, ignoring')
-        return None
-
-    # Make sure the part between our command and price is the right one
-    if not msg_sell_at == '@':
-        log_debug(f"Failed to parse trade message : {msg}")
-        log_debug('Third part seperator incorrect, ignoring')
-        return None
-
-    # Make sure we our price value
-    if not msg_sell_price.isnumeric():
-        log_debug(f"Failed to parse trade message : {msg}")
-        log_debug('Third part price is not a number, ignoring')
+    if buy_count > buy_total:
+        log_debug('Failed to parse trade message : %s', msg_text)
+        log_debug('Buy count is greater than total, ignoring')
         return None
 
     # Build up our response and return it
     order = {
-        'pair' : msg_buy_pair,
-        'buy_count' : msg_buy_count,
-        'buy_total' : msg_buy_total,
-        'sell_price' : msg_sell_price,
+        'pair' : match.group(2).upper(),
+        'buy_count' : buy_count,
+        'buy_total' : buy_total,
+        'sell_price' : float(match.group(5)),
     }
 
     return order
@@ -625,51 +815,243 @@ def process_order(order):
 
     pass
 
-### Main loop ###
+async def handle_new_message(event):
+    # Handles messages from our signal bot in our signal chat, telethon filters out
+    # everything else before calling us (see where this handler is registered)
+    order = parse_trade_message(event.raw_text)
+    if not order == None:
+        process_order(order)
+
+async def run_telegram():
+    # Keep our telegram client connected until we are asked to stop. We are already
+    # logged in, so after a disconnect we only need to connect again. Back off between
+    # attempts so we don't hammer telegram (and get rate limited) while it is down
+    backoff = settings['telegram_reconnect_delay']
+    while state.bot_run:
+        connected_at = None
+        try:
+            if not telegram_api.is_connected():
+                await telegram_api.connect()
+            if telegram_api.is_connected():
+                # Only time a connection that actually came up, failed connects keep backing off
+                connected_at = time.monotonic()
+            await telegram_api.run_until_disconnected()
+        except ConnectionError as e:
+            log_error('Unable to connect to telegram')
+            log_error(e)
+        if not state.bot_run:
+            break
+
+        # If we had been connected for a good while this is a fresh outage, start over
+        # with a short delay
+        if connected_at is not None and time.monotonic() - connected_at > settings['telegram_reconnect_max_delay']:
+            backoff = settings['telegram_reconnect_delay']
+
+        delay = backoff + random.random() * backoff
+        log_debug('Detected telegram_api disconnect - reconnecting in %.1f seconds', delay)
+        await asyncio.sleep(delay)
+        backoff = min(backoff * 2, settings['telegram_reconnect_max_delay'])
+
+async def reload_config_with_retry():
+    # Reload the config file, giving the writer a moment to finish if we caught it
+    # part way through
+    if not reload_config():
+        await asyncio.sleep(0.5)
+        if not reload_config():
+            log_error('Config file does not hold a valid json object, keeping current config')
+
+async def watch_config():
+    # Reload our config whenever the OS tells us the file changed, costs nothing while idle
+    # We watch the directory rather than the file itself, editors (and save_json_file)
+    # save by replacing the file, which would silently end a watch on the old file.
+    # Only the directory itself though, not everything below it
+    config_path = os.path.realpath(settings['config_file'])
+    try:
+        async for changes in awatch(
+            os.path.dirname(config_path),
+            watch_filter=lambda change, path: path == config_path,
+            recursive=False,
+            debounce=500,
+        ):
+            await reload_config_with_retry()
+    except Exception as e:
+        # e.g. the directory itself went away, poll_config will continue to pick up changes
+        log_error('Config file watch stopped, falling back to polling')
+        log_error(e)
 
-try:
-    # Initialize our bot
-    initialize()
-    
-    # Unit tests
-    log_debug("Running unit tests")
-    parse_trade_message(' Test ')
-    parse_trade_message('1,2')
-    parse_trade_message('1, 2, 3')
-    parse_trade_message('1,BUY,EXIT')
-    parse_trade_message('2022-11-22T14:00:00Z, BUY BTC-USD 5 of 8, SELL @ 18698')
-    state['bot_run'] = False
-
-    # Register our new message handler
-    @telegram_api.on(NewMessage)
-    async def my_event_handler(event):
-        # Extrace message details
-        msg_text = event.raw_text
-        msg_chat_id = event.chat_id
-        msg_sender_id = event.sender_id
-        
-        # Handle messages that we are interested in
-        if msg_chat_id == settings['chat_id'] and msg_sender_id == settings['bot_id']:
-            order = parse_trade_message(msg_text)
-            if not order == None:
-                process_order(order)
-
-    # Loop until we are done
-    while(state['bot_run']):
-        telegram_api.start()
-        telegram_api.run_until_disconnected()
-        log_debug('Detected telegram_api disconnect - restarting')
-        
-except KeyboardInterrupt:
-    print()
-    log_debug('User requested bot stop via CTRL+C')
-    state['bot_run'] = False
-finally:
-    # Save our current state to a file if we are in a position 
-    # so we can pick back up where we left off if we are re-started
-    if not state['exit_order_id'] == None:
-        with open(settings['state_file'], 'w') as outfile:
-            outfile.write(json.dumps(state, indent=2))
+async def poll_config():
+    # Fallback for file systems that don't deliver change notifications
+    while True:
+        await asyncio.sleep(settings['config_poll_interval'])
+        try:
+            await reload_config_with_retry()
+        except Exception as e:
+            # Keep polling, this is what picks up changes if watch_config has stopped
+            log_error('Exception occured in poll_config')
+            log_error(e)
+
+def build_accounts_subscription():
+    # Build the signed subscribe request for our account websocket channel
+    now_iso = dydx3_request_helpers.generate_now_iso()
+    signature = dydx_api.private.sign(
+        request_path='/ws/accounts',
+        method='GET',
+        iso_timestamp=now_iso,
+        data={},
+    )
+    return {
+        'type' : 'subscribe',
+        'channel' : 'v3_accounts',
+        'accountNumber' : '0',
+        'apiKey' : dydx_api.api_key_credentials['key'],
+        'passphrase' : dydx_api.api_key_credentials['passphrase'],
+        'timestamp' : now_iso,
+        'signature' : signature,
+    }
+
+async def stream_accounts():
+    # Listen to our account websocket channel and keep our balances up to date from what
+    # the exchange pushes to us, rather than polling. Fills and transfers also clear the
+    # accounts cache rather than waiting for it to expire
+    while state.bot_run:
+        try:
+            async with websockets.connect(dydx_ws_host) as websocket:
+                await websocket.send(json.dumps(build_accounts_subscription()))
+                async for message in websocket:
+                    data = json.loads(message)
+                    if data.get('type') == 'error':
+                        # e.g. our subscription was rejected, the socket stays open but we'll
+                        # never get an update on it, so drop it and fall back to the REST API
+                        log_error('Account websocket error : %s', data.get('message'))
+                        break
+                    contents = data.get('contents', {})
+                    if data.get('type') == 'subscribed':
+                        apply_account_update(contents.get('account', {}))
+                    for account in contents.get('accounts', []):
+                        apply_account_update(account)
+                    if contents.get('fills') or contents.get('transfers'):
+                        invalidate_accounts_cache()
+        except (OSError, websockets.WebSocketException) as e:
+            log_error('Account websocket disconnected, reconnecting')
+            log_error(e)
+        except Exception as e:
+            # e.g. a malformed message, don't let it end the stream for good. Cancellation
+            # at shutdown is a BaseException so still gets through
+            log_error('Account websocket failed, reconnecting')
+            log_error(e)
+
+        # We may have missed updates while disconnected, so fall back to the REST API
+        # for our balance until we are reconnected
+        invalidate_accounts_cache()
+        try:
+            await asyncio.get_running_loop().run_in_executor(None, update_current_balance)
+        except Exception as e:
+            log_error('Unable to update our balance from the exchange')
+            log_error(e)
+        await asyncio.sleep(5)
+
+def request_stop(sig):
+    # Signal handler, wakes up our main coroutine so it can shut the bot down
+    # Start up doesn't watch stop_event, so if we are still starting cancel it instead
+    stop_event.set()
+    if startup_task is not None:
+        startup_task.cancel()
+    if logger is not None:
+        log_debug('User requested bot stop via %s', signal.Signals(sig).name)
+
+async def shutdown():
+    # Stop talking to telegram and save our current state to a file if we are in a
+    # position so we can pick back up where we left off if we are re-started
+    state.bot_run = False
+
+    if telegram_api is not None and telegram_api.is_connected():
+        await telegram_api.disconnect()
+
+    if not state.exit_order_id == None:
+        save_json_file(settings['state_file'], asdict(state))
         log_debug('State information saved to file')
 
     log_info('All done, bot terminating')
+
+async def main():
+
+    global stop_event
+    global startup_task
+
+    # Sleep until we are asked to stop rather than polling, the OS wakes us up on CTRL+C
+    # or a service stop request
+    loop = asyncio.get_running_loop()
+    stop_event = asyncio.Event()
+    startup_task = asyncio.current_task()
+    signals_handled = True
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, request_stop, sig)
+        except NotImplementedError:
+            # Not supported on Windows, CTRL+C raises KeyboardInterrupt there instead
+            signals_handled = False
+
+    try:
+        try:
+            # Initialize our bot
+            await initialize()
+
+            if state.bot_run:
+                # Register our new message handler and log in to telegram
+                telegram_api.add_event_handler(
+                    handle_new_message,
+                    NewMessage(chats=signal_chat_id, from_users=signal_bot_id),
+                )
+
+                # On first run telethon asks for the login code with a blocking input(),
+                # our handler can't run while it waits, so let CTRL+C raise KeyboardInterrupt
+                if signals_handled:
+                    loop.remove_signal_handler(signal.SIGINT)
+                try:
+                    await telegram_api.start()
+                finally:
+                    if signals_handled:
+                        loop.add_signal_handler(signal.SIGINT, request_stop, signal.SIGINT)
+        except asyncio.CancelledError:
+            # request_stop() cancelled our start up, go straight to shutting down
+            if not stop_event.is_set():
+                raise
+        finally:
+            startup_task = None
+
+        if state.bot_run and not stop_event.is_set():
+            # Run our work concurrently until telegram fails or we are asked to stop,
+            # background tasks are simply cancelled when we are done
+            tasks = [
+                asyncio.create_task(run_telegram()),
+            ]
+            background_tasks = [
+                asyncio.create_task(watch_config()),
+                asyncio.create_task(poll_config()),
+                asyncio.create_task(stream_accounts()),
+            ]
+            stop_task = asyncio.create_task(stop_event.wait())
+            await asyncio.wait(tasks + [stop_task], return_when=asyncio.FIRST_COMPLETED)
+
+            for task in tasks + background_tasks + [stop_task]:
+                task.cancel()
+            results = await asyncio.gather(*tasks, *background_tasks, return_exceptions=True)
+            for result in results:
+                if isinstance(result, Exception):
+                    log_error('Exception occured in background task')
+                    log_error(result)
+    finally:
+        await shutdown()
+
+### Main loop ###
+
+# Only start the bot when run as a script, importing this module has no side effects
+if __name__ == '__main__':
+    try:
+        if uvloop is not None:
+            uvloop.run(main())
+        else:
+            asyncio.run(main())
+    except KeyboardInterrupt:
+        # Only reached where the event loop can't install signal handlers
+        pass
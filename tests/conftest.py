@@ -0,0 +1,19 @@
+import logging
+import os
+import sys
+
+import pytest
+
+# The bot is a single script in the repo root rather than an installed package
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import btdBotClient
+
+
+@pytest.fixture(autouse=True)
+def bot_logger():
+    # The logger is normally set up in main(), the helpers log through it
+    btdBotClient.logger = logging.getLogger('btdBotClient')
+    yield btdBotClient.logger
+    btdBotClient.logger = None
+
@@ -0,0 +1,45 @@
+import pytest
+
+from btdBotClient import parse_trade_message
+
+
+@pytest.mark.parametrize('msg_text', [
+    ' Test ',
+    '1,2',
+    '1, 2, 3',
+    '1,BUY,EXIT',
+])
+def test_parse_trade_message_rejects_non_trade_messages(msg_text):
+    assert parse_trade_message(msg_text) is None
+
+
+@pytest.mark.parametrize('msg_text, expected', [
+    (
+        '2022-11-22T14:00:00Z, BUY BTC-USD 5 of 8, SELL @ 18698',
+        {'pair': 'BTC-USD', 'buy_count': 5, 'buy_total': 8, 'sell_price': 18698.0},
+    ),
+    (
+        '2022-11-22T14:00:00Z, buy btc-usd 1 of 1, sell @ 18698.5',
+        {'pair': 'BTC-USD', 'buy_count': 1, 'buy_total': 1, 'sell_price': 18698.5},
+    ),
+    (
+        '  2022-11-22T14:00:00Z ,BUY  BTC-USD  8  OF  8 , SELL @18698  ',
+        {'pair': 'BTC-USD', 'buy_count': 8, 'buy_total': 8, 'sell_price': 18698.0},
+    ),
+])
+def test_parse_trade_message(msg_text, expected):
+    assert parse_trade_message(msg_text) == expected
+
+
+@pytest.mark.parametrize('msg_text', [
+    # Count greater than total
+    '2022-11-22T14:00:00Z, BUY BTC-USD 9 of 8, SELL @ 18698',
+    # Not our trade pair
+    '2022-11-22T14:00:00Z, BUY ETH-USD 5 of 8, SELL @ 1200',
+    '2022-11-22T14:00:00Z, BUY BTC-USDT 5 of 8, SELL @ 18698',
+    # Missing or malformed sell price
+    '2022-11-22T14:00:00Z, BUY BTC-USD 5 of 8, SELL @',
+    '2022-11-22T14:00:00Z, BUY BTC-USD 5 of 8, SELL @ -18698',
+])
+def test_parse_trade_message_rejects_invalid_orders(msg_text):
+    assert parse_trade_message(msg_text) is None
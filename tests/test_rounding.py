@@ -0,0 +1,154 @@
+from decimal import Decimal
+
+import pytest
+
+from btdBotClient import (
+    cache_pair_info,
+    decimal_to_str,
+    float_to_str,
+    pair_cache,
+    round_to_step,
+    round_to_step_exact,
+    round_to_tick,
+    round_to_tick_exact,
+    size_scale,
+)
+
+
+@pytest.fixture
+def make_pair():
+    # Cache a test pair with the passed tick and step sizes, given as the exchange sends them
+    def make(tick_size, step_size='0.001'):
+        cache_pair_info('TEST-USD', {
+            'tickSize': tick_size,
+            'stepSize': step_size,
+            'minOrderSize': step_size,
+            'maxPositionSize': '500',
+        })
+        return 'TEST-USD'
+    yield make
+    pair_cache.pop('TEST-USD', None)
+
+
+@pytest.fixture
+def btc_usd(make_pair):
+    # Same sizes the exchange uses for BTC-USD
+    return make_pair('1', '0.001')
+
+
+@pytest.mark.parametrize('size, expected', [
+    (1.0, 1),
+    (0.1, 10),
+    (0.001, 1000),
+    (0.5, 2),
+    (0.25, 4),
+])
+def test_size_scale_is_exact_for_whole_fractions(size, expected):
+    scale = size_scale(size)
+    assert isinstance(scale, int)
+    assert scale == expected
+
+
+@pytest.mark.parametrize('size', [0.3, 0.7, 2.5, 5.0, 10.0])
+def test_size_scale_other_sizes(size):
+    assert size_scale(size) == pytest.approx(1.0 / size)
+
+
+@pytest.mark.parametrize('value, expected', [
+    (18698.0, 18698.0),
+    (18698.7, 18698.0),
+    (18698.999, 18698.0),
+    (0.5, 0.0),
+])
+def test_round_to_tick(btc_usd, value, expected):
+    assert round_to_tick(value, btc_usd) == expected
+
+
+@pytest.mark.parametrize('value, expected', [
+    # Float error used to floor values already on the grid down a tick
+    (0.3, 0.3),
+    (0.1 + 0.2, 0.3),
+    (0.7, 0.7),
+    (0.35, 0.3),
+])
+def test_round_to_tick_float_error(make_pair, value, expected):
+    assert round_to_tick(value, make_pair('0.1')) == pytest.approx(expected)
+
+
+@pytest.mark.parametrize('tick_size, value, expected', [
+    ('0.3', 0.9, 0.9),
+    ('0.3', 1.0, 0.9),
+    ('0.3', 0.29, 0.0),
+    ('0.7', 1.5, 1.4),
+    ('0.5', 18698.7, 18698.5),
+])
+def test_round_to_tick_non_power_of_ten(make_pair, tick_size, value, expected):
+    assert round_to_tick(value, make_pair(tick_size)) == pytest.approx(expected)
+
+
+@pytest.mark.parametrize('tick_size, value, expected', [
+    ('5', 18698.7, 18695.0),
+    ('5', 18695.0, 18695.0),
+    ('10', 18698.7, 18690.0),
+    ('10', 18690.0, 18690.0),
+])
+def test_round_to_tick_above_one(make_pair, tick_size, value, expected):
+    assert round_to_tick(value, make_pair(tick_size)) == pytest.approx(expected)
+
+
+@pytest.mark.parametrize('step_size, value, expected', [
+    ('0.1', 0.1 + 0.2, 0.3),
+    ('0.5', 1.75, 1.5),
+    ('10', 25.0, 20.0),
+])
+def test_round_to_step(make_pair, step_size, value, expected):
+    assert round_to_step(value, make_pair('1', step_size)) == pytest.approx(expected)
+
+
+@pytest.mark.parametrize('value, expected', [
+    (0.3, '0.3'),
+    (1.23456, '1.234'),
+    (0.0019, '0.001'),
+    (0.0009, '0'),
+    (2, '2'),
+])
+def test_round_to_step_exact(btc_usd, value, expected):
+    rounded = round_to_step_exact(value, btc_usd)
+    assert isinstance(rounded, Decimal)
+    assert decimal_to_str(rounded) == expected
+
+
+@pytest.mark.parametrize('step_size, value, expected', [
+    ('0.1', 0.1 + 0.2, '0.3'),
+    ('0.5', 1.75, '1.5'),
+    ('0.5', 1.3, '1'),
+    ('10', 25, '20'),
+])
+def test_round_to_step_exact_other_sizes(make_pair, step_size, value, expected):
+    assert decimal_to_str(round_to_step_exact(value, make_pair('1', step_size))) == expected
+
+
+@pytest.mark.parametrize('tick_size, value, expected', [
+    ('0.5', 18698.7, '18698.5'),
+    ('5', 18698.7, '18695'),
+    ('0.1', 0.1 + 0.2, '0.3'),
+])
+def test_round_to_tick_exact(make_pair, tick_size, value, expected):
+    assert decimal_to_str(round_to_tick_exact(value, make_pair(tick_size))) == expected
+
+
+@pytest.mark.parametrize('value, precision_type, expected', [
+    (0.3, 'base_assetPrecision', '0.3'),
+    (1.234, 'base_assetPrecision', '1.234'),
+    (0.1 + 0.2, 'base_assetPrecision', '0.3'),
+    (5.0, 'base_assetPrecision', '5'),
+    (18698.0, 'quote_assetPrecision', '18698'),
+    (18698.4, 'quote_assetPrecision', '18698'),
+    (18698.4, 'unknown', '18698'),
+])
+def test_float_to_str(btc_usd, value, precision_type, expected):
+    assert float_to_str(value, btc_usd, precision_type) == expected
+
+
+def test_float_to_str_tick_above_one(make_pair):
+    assert float_to_str(18695.0, make_pair('5'), 'quote_assetPrecision') == '18695'